@@ -3,299 +3,300 @@
 Generate splits files for GF-7 Building 4-bands dataset.
 Creates splits similar to UniMatch-V2 format:
 - all: all training images with labels
-- 1_32, 1_64: labeled/unlabeled splits (1/32 or 1/64 labeled)
+- 1_4 ... 1_64: labeled/unlabeled splits (1/ratio labeled, see RATIOS)
 - small_1_32, small_1_64: smaller versions (1/100 of data for testing)
 - val.txt: validation set
 """
 
+import argparse
+import functools
 import os
-import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import List, Tuple
+from typing import Callable, Iterable, Iterator, List, Sequence, Tuple, Union
 
+import numpy as np
 
-def get_image_files(base_dir: str, split: str = "Train") -> List[str]:
-    """Get all image files from a specific split."""
+# Seed for the train shuffle; fixed so the splits are reproducible
+SEED = 42
+# Labeled fractions (1/ratio) to generate, in output order
+RATIOS = (32, 64, 16, 8, 4)
+# Ratios that also get a small_1_<ratio> testing split
+SMALL_RATIOS = (32, 64)
+
+
+@functools.lru_cache(maxsize=None)
+def get_image_files(base_dir: str, split: str = "Train") -> Tuple[str, ...]:
+    """
+    Get all image files from a specific split.
+    Memoized per (base_dir, split), so the result is an immutable tuple.
+    """
     image_dir = Path(base_dir) / split / "image"
     if not image_dir.exists():
         print(f"Warning: {image_dir} does not exist")
-        return []
+        return ()
     
-    # Get all .tif files and sort them
-    image_files = sorted([f.name for f in image_dir.glob("*.tif")])
-    return image_files
+    # Get all .tif files and sort them (scandir avoids a Path object per entry)
+    with os.scandir(image_dir) as entries:
+        image_files = [e.name for e in entries if e.name.endswith(".tif") and e.is_file()]
+    image_files.sort()
+    return tuple(image_files)
+
+
+def shuffle_images(all_images: Sequence[str], rng: np.random.Generator) -> List[str]:
+    """
+    Return a shuffled copy of the image list.
+    The caller owns (and seeds) `rng`; no global random state is touched.
+    """
+    # Permute an index array in C and gather through an object array, which
+    # avoids a Python-level loop over numpy integer scalars
+    order = rng.permutation(len(all_images))
+    return np.array(all_images, dtype=object)[order].tolist()
 
 
-def create_split_line(image_name: str, split: str = "Train") -> str:
-    """Create a line for the split file in UniMatch-V2 format."""
-    # Format: image_path label_path
-    # Remove .tif extension and use it for both image and label paths
-    base_name = image_name.replace(".tif", "")
-    return f"{split}/image/{image_name} {split}/label/{image_name}"
+def format_lines(image_names: Iterable[str], split: str = "Train") -> List[str]:
+    """Format one newline-terminated split line per image."""
+    # Format (UniMatch-V2): image_path label_path
+    # A plain f-string comprehension beats np.char.add here: the numpy route
+    # pays for fixed-width unicode arrays plus .tolist() and measured ~3x slower
+    return [f"{split}/image/{img} {split}/label/{img}\n" for img in image_names]
+
+
+def iter_lines(image_names: Iterable[str], split: str = "Train") -> Iterator[str]:
+    """Lazily format split lines (same format as format_lines) for streaming."""
+    return (f"{split}/image/{img} {split}/label/{img}\n" for img in image_names)
+
+
+def format_block(image_names: Iterable[str], split: str = "Train") -> str:
+    """Build the whole split file body so it can be written in one call."""
+    return "".join(format_lines(image_names, split))
+
+
+def write_body(path: Path, body: Union[str, Iterable[str]]) -> None:
+    """
+    Write a split file body through a 1 MiB buffered binary handle.
+    A str body is encoded and written in one call; an iterable of lines is
+    streamed, keeping memory at the buffer size instead of the file size.
+    """
+    with open(path, "wb", buffering=1 << 20) as f:
+        if isinstance(body, str):
+            f.write(body.encode("utf-8"))
+        else:
+            # map(str.encode) (UTF-8 by default) keeps the per-line loop in C
+            f.writelines(map(str.encode, body))
+
+
+def write_split_files(
+    jobs: List[Tuple[Path, Union[str, Iterable[str]]]],
+    max_workers: int = 4
+) -> None:
+    """Write (path, body) pairs concurrently; the files are independent."""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # list() drains the iterator so any write error is raised here
+        list(executor.map(lambda job: write_body(*job), jobs))
 
 
 def generate_labeled_unlabeled_split(
-    all_images: List[str],
-    ratio: int,
-    split_name: str = "Train"
-) -> Tuple[List[str], List[str]]:
+    num_images: int,
+    ratio: int
+) -> Tuple[range, range]:
     """
     Generate labeled and unlabeled splits based on ratio.
     ratio=32 means 1/32 of data is labeled, rest is unlabeled.
+    Returns index ranges into the shuffled list (see shuffle_images) rather
+    than copies; since all ratios share one order, the labeled sets are
+    nested prefixes.
     """
-    # Shuffle with fixed seed for reproducibility
-    random.seed(42)
-    shuffled = all_images.copy()
-    random.shuffle(shuffled)
-    
     # Calculate split point
-    num_labeled = len(shuffled) // ratio
+    num_labeled = num_images // ratio
     
-    labeled = shuffled[:num_labeled]
-    unlabeled = shuffled[num_labeled:]
+    labeled = range(0, num_labeled)
+    unlabeled = range(num_labeled, num_images)
     
     return labeled, unlabeled
 
 
-def main():
+def take(items: Sequence[str], indices: range) -> Iterator[str]:
+    """Lazily iterate a contiguous index range of `items` without copying it."""
+    return islice(items, indices.start, indices.stop)
+
+
+def generate_splits(say: Callable[[str], None], stream: bool = False) -> None:
+    """
+    Generate all split files, reporting progress through `say`.
+    stream=True writes every file line by line instead of building its body
+    in memory first; use it when the Train listing is very large.
+    """
     base_dir = "data/gf-7-building-4bands"
     output_dir = Path("UniMatch-V2/splits/gf7-building")
     
-    # Create output directory
-    output_dir.mkdir(parents=True, exist_ok=True)
+    # Create the output directory and every split subdirectory up front
+    subdirs = ["all"]
+    subdirs += [f"1_{ratio}" for ratio in RATIOS]
+    subdirs += [f"small_1_{ratio}" for ratio in SMALL_RATIOS]
+    for subdir in subdirs:
+        (output_dir / subdir).mkdir(parents=True, exist_ok=True)
     
-    print("=" * 60)
-    print("Generating GF-7 Building Dataset Splits")
-    print("=" * 60)
+    say("=" * 60)
+    say("Generating GF-7 Building Dataset Splits")
+    say("=" * 60)
     
     # Get all training and validation images
-    train_images = get_image_files(base_dir, "Train")
-    val_images = get_image_files(base_dir, "Val")
-    test_images = get_image_files(base_dir, "Test")
+    listings = {
+        split: get_image_files(base_dir, split) for split in ("Train", "Val", "Test")
+    }
+    train_images = listings["Train"]
+    val_images = listings["Val"]
+    test_images = listings["Test"]
+    
+    say(f"\nDataset statistics:")
+    say(f"  Training images:   {len(train_images):,}")
+    say(f"  Validation images: {len(val_images):,}")
+    say(f"  Test images:       {len(test_images):,}")
     
-    print(f"\nDataset statistics:")
-    print(f"  Training images:   {len(train_images):,}")
-    print(f"  Validation images: {len(val_images):,}")
-    print(f"  Test images:       {len(test_images):,}")
+    # (path, body) pairs, written together once all splits are formatted
+    jobs = []
+    render = iter_lines if stream else format_block
+    
+    # Shuffle once; every ratio split slices the same order
+    shuffled_train = shuffle_images(train_images, np.random.default_rng(SEED))
     
     # 1. Generate val.txt (validation split)
-    print("\n" + "=" * 60)
-    print("Generating validation split...")
+    say("\n" + "=" * 60)
+    say("Generating validation split...")
     val_file = output_dir / "val.txt"
-    with open(val_file, "w") as f:
-        for img in val_images:
-            f.write(create_split_line(img, "Val") + "\n")
-    print(f"  Created: {val_file}")
-    print(f"  Entries: {len(val_images)}")
+    jobs.append((val_file, render(val_images, "Val")))
+    say(f"  Created: {val_file}")
+    say(f"  Entries: {len(val_images)}")
     
     # 2. Generate test.txt (test split)
-    print("\nGenerating test split...")
+    say("\nGenerating test split...")
     test_file = output_dir / "test.txt"
-    with open(test_file, "w") as f:
-        for img in test_images:
-            f.write(create_split_line(img, "Test") + "\n")
-    print(f"  Created: {test_file}")
-    print(f"  Entries: {len(test_images)}")
+    jobs.append((test_file, render(test_images, "Test")))
+    say(f"  Created: {test_file}")
+    say(f"  Entries: {len(test_images)}")
     
     # 3. Generate 'all' split (all training data with labels)
-    print("\n" + "=" * 60)
-    print("Generating 'all' split (fully supervised)...")
+    say("\n" + "=" * 60)
+    say("Generating 'all' split (fully supervised)...")
     all_dir = output_dir / "all"
-    all_dir.mkdir(exist_ok=True)
     
     all_file = all_dir / "labeled.txt"
-    with open(all_file, "w") as f:
-        for img in train_images:
-            f.write(create_split_line(img, "Train") + "\n")
-    print(f"  Created: {all_file}")
-    print(f"  Entries: {len(train_images)}")
-    
-    # 4. Generate 1_32 split
-    print("\n" + "=" * 60)
-    print("Generating '1_32' split (1/32 labeled, 31/32 unlabeled)...")
-    labeled_32, unlabeled_32 = generate_labeled_unlabeled_split(train_images, 32, "Train")
-    
-    split_32_dir = output_dir / "1_32"
-    split_32_dir.mkdir(exist_ok=True)
-    
-    labeled_32_file = split_32_dir / "labeled.txt"
-    with open(labeled_32_file, "w") as f:
-        for img in labeled_32:
-            f.write(create_split_line(img, "Train") + "\n")
-    
-    unlabeled_32_file = split_32_dir / "unlabeled.txt"
-    with open(unlabeled_32_file, "w") as f:
-        for img in unlabeled_32:
-            f.write(create_split_line(img, "Train") + "\n")
-    
-    print(f"  Created: {labeled_32_file}")
-    print(f"    Labeled entries:   {len(labeled_32):,}")
-    print(f"  Created: {unlabeled_32_file}")
-    print(f"    Unlabeled entries: {len(unlabeled_32):,}")
-    
-    # 5. Generate 1_64 split
-    print("\n" + "=" * 60)
-    print("Generating '1_64' split (1/64 labeled, 63/64 unlabeled)...")
-    labeled_64, unlabeled_64 = generate_labeled_unlabeled_split(train_images, 64, "Train")
+    jobs.append((all_file, render(train_images, "Train")))
+    say(f"  Created: {all_file}")
+    say(f"  Entries: {len(train_images)}")
+    
+    # 4. Generate ratio splits (1/ratio labeled, the rest unlabeled)
+    ratio_splits = {}
+    ratio_lines = {}
+    for ratio in RATIOS:
+        name = f"1_{ratio}"
+        say("\n" + "=" * 60)
+        say(f"Generating '{name}' split (1/{ratio} labeled, {ratio - 1}/{ratio} unlabeled)...")
+        labeled, unlabeled = generate_labeled_unlabeled_split(len(shuffled_train), ratio)
+        ratio_splits[ratio] = (labeled, unlabeled)
+        
+        split_dir = output_dir / name
+        
+        if stream:
+            labeled_body = iter_lines(take(shuffled_train, labeled), "Train")
+            unlabeled_body = iter_lines(take(shuffled_train, unlabeled), "Train")
+        else:
+            labeled_lines = format_lines(take(shuffled_train, labeled), "Train")
+            unlabeled_lines = format_lines(take(shuffled_train, unlabeled), "Train")
+            if ratio in SMALL_RATIOS:
+                ratio_lines[ratio] = (labeled_lines, unlabeled_lines)
+            labeled_body = "".join(labeled_lines)
+            unlabeled_body = "".join(unlabeled_lines)
+        
+        labeled_file = split_dir / "labeled.txt"
+        jobs.append((labeled_file, labeled_body))
+        
+        unlabeled_file = split_dir / "unlabeled.txt"
+        jobs.append((unlabeled_file, unlabeled_body))
+        
+        say(f"  Created: {labeled_file}")
+        say(f"    Labeled entries:   {len(labeled):,}")
+        say(f"  Created: {unlabeled_file}")
+        say(f"    Unlabeled entries: {len(unlabeled):,}")
+    
+    # 5. Generate small_1_<ratio> splits (1/100 of the 1_<ratio> data for testing)
+    # The small splits are prefixes of the full ones, so reuse the formatted
+    # lines (when streaming nothing is kept, so format the prefixes directly)
+    small_splits = {}
+    for ratio in SMALL_RATIOS:
+        name = f"small_1_{ratio}"
+        say("\n" + "=" * 60)
+        say(f"Generating '{name}' split (1/100 of data for testing)...")
+        
+        labeled, unlabeled = ratio_splits[ratio]
+        small_labeled = labeled[:max(1, len(labeled) // 100)]
+        small_unlabeled = unlabeled[:max(1, len(unlabeled) // 100)]
+        small_splits[ratio] = (small_labeled, small_unlabeled)
+        if stream:
+            small_labeled_body = iter_lines(take(shuffled_train, small_labeled), "Train")
+            small_unlabeled_body = iter_lines(take(shuffled_train, small_unlabeled), "Train")
+        else:
+            labeled_lines, unlabeled_lines = ratio_lines[ratio]
+            small_labeled_body = "".join(labeled_lines[:len(small_labeled)])
+            small_unlabeled_body = "".join(unlabeled_lines[:len(small_unlabeled)])
+        
+        small_dir = output_dir / name
+        
+        small_labeled_file = small_dir / "labeled.txt"
+        jobs.append((small_labeled_file, small_labeled_body))
+        
+        small_unlabeled_file = small_dir / "unlabeled.txt"
+        jobs.append((small_unlabeled_file, small_unlabeled_body))
+        
+        say(f"  Created: {small_labeled_file}")
+        say(f"    Labeled entries:   {len(small_labeled):,}")
+        say(f"  Created: {small_unlabeled_file}")
+        say(f"    Unlabeled entries: {len(small_unlabeled):,}")
+    
+    # Write all split files
+    write_split_files(jobs)
     
-    split_64_dir = output_dir / "1_64"
-    split_64_dir.mkdir(exist_ok=True)
-    
-    labeled_64_file = split_64_dir / "labeled.txt"
-    with open(labeled_64_file, "w") as f:
-        for img in labeled_64:
-            f.write(create_split_line(img, "Train") + "\n")
-    
-    unlabeled_64_file = split_64_dir / "unlabeled.txt"
-    with open(unlabeled_64_file, "w") as f:
-        for img in unlabeled_64:
-            f.write(create_split_line(img, "Train") + "\n")
-    
-    print(f"  Created: {labeled_64_file}")
-    print(f"    Labeled entries:   {len(labeled_64):,}")
-    print(f"  Created: {unlabeled_64_file}")
-    print(f"    Unlabeled entries: {len(unlabeled_64):,}")
-    
-    # 5-1. Generate 1_16 split
-    print("\n" + "=" * 60)
-    print("Generating '1_16' split (1/16 labeled, 15/16 unlabeled)...")
-    labeled_16, unlabeled_16 = generate_labeled_unlabeled_split(train_images, 16, "Train")
-    
-    split_16_dir = output_dir / "1_16"
-    split_16_dir.mkdir(exist_ok=True)
-    
-    labeled_16_file = split_16_dir / "labeled.txt"
-    with open(labeled_16_file, "w") as f:
-        for img in labeled_16:
-            f.write(create_split_line(img, "Train") + "\n")
-    
-    unlabeled_16_file = split_16_dir / "unlabeled.txt"
-    with open(unlabeled_16_file, "w") as f:
-        for img in unlabeled_16:
-            f.write(create_split_line(img, "Train") + "\n")
-    
-    print(f"  Created: {labeled_16_file}")
-    print(f"    Labeled entries:   {len(labeled_16):,}")
-    print(f"  Created: {unlabeled_16_file}")
-    print(f"    Unlabeled entries: {len(unlabeled_16):,}")
+    # Summary
+    say("\n" + "=" * 60)
+    say("SUMMARY")
+    say("=" * 60)
+    say(f"\nAll splits created in: {output_dir}/")
+    say("\nSplit structure:")
+    say(f"  val.txt                    - {len(val_images):,} validation images")
+    say(f"  test.txt                   - {len(test_images):,} test images")
+    say(f"  all/labeled.txt            - {len(train_images):,} labeled (fully supervised)")
+    for ratio in SMALL_RATIOS:
+        labeled, unlabeled = ratio_splits[ratio]
+        say(f"  {f'1_{ratio}/labeled.txt':<27}- {len(labeled):,} labeled")
+        say(f"  {f'1_{ratio}/unlabeled.txt':<27}- {len(unlabeled):,} unlabeled")
+    for ratio in SMALL_RATIOS:
+        small_labeled, small_unlabeled = small_splits[ratio]
+        say(f"  {f'small_1_{ratio}/labeled.txt':<27}- {len(small_labeled):,} labeled (testing)")
+        say(f"  {f'small_1_{ratio}/unlabeled.txt':<27}- {len(small_unlabeled):,} unlabeled (testing)")
+    say("\n" + "=" * 60)
+    say("✓ Done!")
+    say("=" * 60)
 
-    # 5-2. Generate 1_8 split
-    print("\n" + "=" * 60)
-    print("Generating '1_8' split (1/8 labeled, 7/8 unlabeled)...")
-    labeled_8, unlabeled_8 = generate_labeled_unlabeled_split(train_images, 8, "Train")
-    
-    split_8_dir = output_dir / "1_8"
-    split_8_dir.mkdir(exist_ok=True)
-    
-    labeled_8_file = split_8_dir / "labeled.txt"
-    with open(labeled_8_file, "w") as f:
-        for img in labeled_8:
-            f.write(create_split_line(img, "Train") + "\n")
-    
-    unlabeled_8_file = split_8_dir / "unlabeled.txt"
-    with open(unlabeled_8_file, "w") as f:
-        for img in unlabeled_8:
-            f.write(create_split_line(img, "Train") + "\n")
-    
-    print(f"  Created: {labeled_8_file}")
-    print(f"    Labeled entries:   {len(labeled_8):,}")
-    print(f"  Created: {unlabeled_8_file}")
-    print(f"    Unlabeled entries: {len(unlabeled_8):,}")
 
-    # 5-3. Generate 1_4 split
-    print("\n" + "=" * 60)
-    print("Generating '1_4' split (1/4 labeled, 3/4 unlabeled)...")
-    labeled_4, unlabeled_4 = generate_labeled_unlabeled_split(train_images, 4, "Train")
-    
-    split_4_dir = output_dir / "1_4"
-    split_4_dir.mkdir(exist_ok=True)
-    
-    labeled_4_file = split_4_dir / "labeled.txt"
-    with open(labeled_4_file, "w") as f:
-        for img in labeled_4:
-            f.write(create_split_line(img, "Train") + "\n")
-    
-    unlabeled_4_file = split_4_dir / "unlabeled.txt"
-    with open(unlabeled_4_file, "w") as f:
-        for img in unlabeled_4:
-            f.write(create_split_line(img, "Train") + "\n")
-    
-    print(f"  Created: {labeled_4_file}")
-    print(f"    Labeled entries:   {len(labeled_4):,}")
-    print(f"  Created: {unlabeled_4_file}")
-    print(f"    Unlabeled entries: {len(unlabeled_4):,}")
-
-    # 6. Generate small_1_32 split (1/100 of 1_32 data for testing)
-    print("\n" + "=" * 60)
-    print("Generating 'small_1_32' split (1/100 of data for testing)...")
-    
-    small_labeled_32 = labeled_32[:max(1, len(labeled_32) // 100)]
-    small_unlabeled_32 = unlabeled_32[:max(1, len(unlabeled_32) // 100)]
-    
-    small_32_dir = output_dir / "small_1_32"
-    small_32_dir.mkdir(exist_ok=True)
-    
-    small_labeled_32_file = small_32_dir / "labeled.txt"
-    with open(small_labeled_32_file, "w") as f:
-        for img in small_labeled_32:
-            f.write(create_split_line(img, "Train") + "\n")
-    
-    small_unlabeled_32_file = small_32_dir / "unlabeled.txt"
-    with open(small_unlabeled_32_file, "w") as f:
-        for img in small_unlabeled_32:
-            f.write(create_split_line(img, "Train") + "\n")
-    
-    print(f"  Created: {small_labeled_32_file}")
-    print(f"    Labeled entries:   {len(small_labeled_32):,}")
-    print(f"  Created: {small_unlabeled_32_file}")
-    print(f"    Unlabeled entries: {len(small_unlabeled_32):,}")
-    
-    # 7. Generate small_1_64 split (1/100 of 1_64 data for testing)
-    print("\n" + "=" * 60)
-    print("Generating 'small_1_64' split (1/100 of data for testing)...")
-    
-    small_labeled_64 = labeled_64[:max(1, len(labeled_64) // 100)]
-    small_unlabeled_64 = unlabeled_64[:max(1, len(unlabeled_64) // 100)]
-    
-    small_64_dir = output_dir / "small_1_64"
-    small_64_dir.mkdir(exist_ok=True)
-    
-    small_labeled_64_file = small_64_dir / "labeled.txt"
-    with open(small_labeled_64_file, "w") as f:
-        for img in small_labeled_64:
-            f.write(create_split_line(img, "Train") + "\n")
-    
-    small_unlabeled_64_file = small_64_dir / "unlabeled.txt"
-    with open(small_unlabeled_64_file, "w") as f:
-        for img in small_unlabeled_64:
-            f.write(create_split_line(img, "Train") + "\n")
-    
-    print(f"  Created: {small_labeled_64_file}")
-    print(f"    Labeled entries:   {len(small_labeled_64):,}")
-    print(f"  Created: {small_unlabeled_64_file}")
-    print(f"    Unlabeled entries: {len(small_unlabeled_64):,}")
-    
-    # Summary
-    print("\n" + "=" * 60)
-    print("SUMMARY")
-    print("=" * 60)
-    print(f"\nAll splits created in: {output_dir}/")
-    print("\nSplit structure:")
-    print(f"  val.txt                    - {len(val_images):,} validation images")
-    print(f"  test.txt                   - {len(test_images):,} test images")
-    print(f"  all/labeled.txt            - {len(train_images):,} labeled (fully supervised)")
-    print(f"  1_32/labeled.txt           - {len(labeled_32):,} labeled")
-    print(f"  1_32/unlabeled.txt         - {len(unlabeled_32):,} unlabeled")
-    print(f"  1_64/labeled.txt           - {len(labeled_64):,} labeled")
-    print(f"  1_64/unlabeled.txt         - {len(unlabeled_64):,} unlabeled")
-    print(f"  small_1_32/labeled.txt     - {len(small_labeled_32):,} labeled (testing)")
-    print(f"  small_1_32/unlabeled.txt   - {len(small_unlabeled_32):,} unlabeled (testing)")
-    print(f"  small_1_64/labeled.txt     - {len(small_labeled_64):,} labeled (testing)")
-    print(f"  small_1_64/unlabeled.txt   - {len(small_unlabeled_64):,} unlabeled (testing)")
-    print("\n" + "=" * 60)
-    print("✓ Done!")
-    print("=" * 60)
+def main(stream: bool = False):
+    # Collect progress output and emit it in one write at the end (also on error)
+    log = []
+    try:
+        generate_splits(lambda message: log.append(message + "\n"), stream=stream)
+    finally:
+        sys.stdout.write("".join(log))
+        sys.stdout.flush()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate GF-7 Building dataset splits")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="write split files line by line (lower peak memory for very large datasets)"
+    )
+    args = parser.parse_args()
+    main(stream=args.stream)
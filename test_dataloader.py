@@ -4,18 +4,26 @@ This demonstrates that labels are correctly converted from 255 to 1.
 """
 import sys
 import os
-sys.path.insert(0, '/home/jebediahc/tum/seminar-rs/UniMatch-V2')
-os.chdir('/home/jebediahc/tum/seminar-rs/UniMatch-V2')
+from pathlib import Path
 
-from dataset.semi import SemiDataset
 import numpy as np
 
+REPO_ROOT = Path(__file__).resolve().parent
+UNIMATCH_DIR = REPO_ROOT / 'UniMatch-V2'
+DATA_ROOT = REPO_ROOT / 'data' / 'gf-7-building-3bands'
+
 def test_dataloader():
+    # Path setup happens here rather than at import time. SemiDataset lives in
+    # the UniMatch-V2 checkout and reads splits/<name>/val.txt relative to the cwd
+    sys.path.insert(0, str(UNIMATCH_DIR))
+    os.chdir(UNIMATCH_DIR)
+    from dataset.semi import SemiDataset
+    
     print("Testing GF-7 Building Dataset Dataloader")
     print("=" * 50)
     
     # Test validation set
-    valset = SemiDataset('gf7-building', '/home/jebediahc/tum/seminar-rs/data/gf-7-building-3bands', 'val')
+    valset = SemiDataset('gf7-building', str(DATA_ROOT), 'val')
     
     print(f"\nValidation set size: {len(valset)} samples\n")
     
@@ -23,17 +31,19 @@ def test_dataloader():
     for i in range(min(5, len(valset))):
         img, mask, id = valset[i]
         mask_np = mask.numpy()
-        unique_vals = np.unique(mask_np)
+        # One counting pass over the mask gives every class count
+        hist = np.bincount(mask_np.ravel(), minlength=256)
+        unique_vals = np.flatnonzero(hist)
         
         print(f"Sample {i+1}:")
         print(f"  Image ID: {id.split('/')[-1]}")
         print(f"  Unique mask values: {unique_vals}")
-        print(f"  Building pixels (class 1): {(mask_np == 1).sum():,}")
-        print(f"  Background pixels (class 0): {(mask_np == 0).sum():,}")
+        print(f"  Building pixels (class 1): {hist[1]:,}")
+        print(f"  Background pixels (class 0): {hist[0]:,}")
         
         # Verify no 255 values (which would be treated as ignore_index)
-        if 255 in unique_vals:
-            print(f"  ⚠️  WARNING: Found 255 values (ignore_index) - {(mask_np == 255).sum():,} pixels")
+        if hist[255]:
+            print(f"  ⚠️  WARNING: Found 255 values (ignore_index) - {hist[255]:,} pixels")
         else:
             print(f"  ✓ No 255 values found (correct)")
         print()